@@ -1,13 +1,15 @@
 import os
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
 from io import BytesIO
 from datetime import datetime
 
-import pandas as pd
 import spacy
+import xlsxwriter
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from apscheduler.schedulers.background import BackgroundScheduler
 
@@ -15,7 +17,9 @@ from .config import (
     MENTIONS_REFRESH_SECONDS,
     OFAC_REFRESH_HOURS,
     API_RESULTS_LIMIT,
+    SEEN_IDS_MAX,
     SPACY_MODEL,
+    SPACY_BATCH_SIZE,
 )
 from .ofac import fetch_and_parse_sdn
 from .ingest import collect_mentions
@@ -36,7 +40,7 @@ STATE: Dict[str, Any] = {
     "ofac_meta": {},
     "ofac_index": {"names": [], "map": {}},
     "mentions": [],           # lista de items ya procesados
-    "seen_ids": set(),        # dedupe por id
+    "seen_ids": OrderedDict(),  # dedupe por id (LRU acotado a SEEN_IDS_MAX)
     "last_mentions_run_utc": None,
     "last_error": None,
 }
@@ -47,36 +51,55 @@ SCHEDULER: Optional[BackgroundScheduler] = None
 # ==================================================
 # NLP
 # ==================================================
-nlp = spacy.load(SPACY_MODEL)
+@lru_cache(maxsize=1)
+def get_nlp():
+    """
+    Carga perezosa del modelo: solo se paga al primer uso real de NER
+    (no al importar el módulo ni en endpoints que no lo usan).
+    Solo usamos NER: el resto del pipeline (tagger/parser/lemmatizer) es costo puro.
+    """
+    return spacy.load(SPACY_MODEL, disable=["tagger", "parser", "attribute_ruler", "lemmatizer"])
 
-def extract_persons(text: str) -> List[str]:
-    doc = nlp(text or "")
-    persons = [ent.text.strip() for ent in doc.ents if ent.label_ == "PERSON"]
+def _persons_from_doc(doc) -> List[str]:
+    persons = (ent.text.strip() for ent in doc.ents if ent.label_ == "PERSON")
 
-    # dedupe simple preservando orden
-    seen = set()
-    out: List[str] = []
+    # dedupe simple preservando orden (dict = orden de inserción; gana la primera grafía)
+    uniq: Dict[str, str] = {}
     for p in persons:
-        k = p.lower()
-        if k not in seen and len(p) >= 3:
-            out.append(p)
-            seen.add(k)
-    return out
+        if len(p) >= 3:
+            uniq.setdefault(p.lower(), p)
+    return list(uniq.values())
+
+def extract_persons(text: str) -> List[str]:
+    return _persons_from_doc(get_nlp()(text or ""))
 
 
 # ==================================================
 # Helpers (Excel)
 # ==================================================
+_EXCEL_COLUMNS = [
+    "processed_utc",
+    "source",
+    "published",
+    "link",
+    "has_ofac_match",
+    "persons",
+    "ofac_matches",
+    "text",
+]
+
+_NL_TABLE = str.maketrans({"\r": "\n"})
+
 def _clip_excel(x: Any, max_len: int = 32767) -> str:
     """
     Excel tiene límite por celda ~32767 chars.
     Además evitamos None y normalizamos saltos de línea.
     """
     s = "—" if x is None else str(x)
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
-    if len(s) > max_len:
-        s = s[:max_len]
-    return s
+    if "\r" in s:
+        # caso raro: solo entonces se paga el reemplazo (\r\n -> \n, luego \r suelto -> \n)
+        s = s.replace("\r\n", "\n").translate(_NL_TABLE)
+    return s if len(s) <= max_len else s[:max_len]
 
 
 # ==================================================
@@ -102,16 +125,42 @@ def refresh_mentions():
         now = dt.datetime.utcnow().isoformat() + "Z"
         out = []
 
+        # filtrar ya vistos (y repetidos dentro del mismo batch) antes de pasar por spaCy
+        seen_ids = STATE["seen_ids"]
+        to_process = []
+        batch_ids = set()
         for item in raw:
-            if item["id"] in STATE["seen_ids"]:
+            if item["id"] in seen_ids:
+                # sigue apareciendo en las fuentes: refrescar para que no lo desaloje el LRU
+                seen_ids.move_to_end(item["id"])
                 continue
+            if item["id"] in batch_ids:
+                continue
+            batch_ids.add(item["id"])
+            to_process.append(item)
 
-            persons = extract_persons(item["text"])
+        # NER en batch: nlp.pipe amortiza el costo por documento
+        docs = (
+            get_nlp().pipe((it["text"] or "" for it in to_process), batch_size=SPACY_BATCH_SIZE, n_process=1)
+            if to_process else []
+        )
+
+        persons_by_item = [_persons_from_doc(doc) for doc in docs]
+
+        # Matching en batch: cada nombre distinto del tick se cruza contra OFAC una sola vez
+        # (las noticias repiten mucho los mismos nombres entre items)
+        ofac_index = STATE["ofac_index"]
+        match_by_person = {
+            p: fuzzy_match(p, ofac_index, min_score=92)
+            for p in dict.fromkeys(p for persons in persons_by_item for p in persons)
+        }
+
+        for item, persons in zip(to_process, persons_by_item):
             matches = []
 
             # Si OFAC todavía no cargó, igual guardamos el candidato por contexto
             for p in persons:
-                m = fuzzy_match(p, STATE["ofac_index"], min_score=92)
+                m = match_by_person[p]
                 if m:
                     best_name, score, entry = m
                     matches.append(
@@ -133,7 +182,10 @@ def refresh_mentions():
                     "processed_utc": now,
                 }
             )
-            STATE["seen_ids"].add(item["id"])
+            seen_ids[item["id"]] = None
+
+        while len(seen_ids) > SEEN_IDS_MAX:
+            seen_ids.popitem(last=False)
 
         # agregar y capar
         if out:
@@ -197,7 +249,7 @@ def home():
     with open(os.path.join(static_dir, "index.html"), "r", encoding="utf-8") as f:
         return f.read()
 
-@app.get("/api/status")
+@app.get("/api/status", response_class=ORJSONResponse)
 def api_status():
     return {
         "ofac_meta": STATE.get("ofac_meta", {}),
@@ -208,7 +260,7 @@ def api_status():
         "last_error": STATE.get("last_error"),
     }
 
-@app.get("/api/results")
+@app.get("/api/results", response_class=ORJSONResponse)
 def api_results(only_ofac: int = 0, limit: int = 200):
     limit = max(1, min(int(limit), API_RESULTS_LIMIT))
     items = STATE.get("mentions", [])
@@ -229,45 +281,43 @@ def api_export_excel(only_ofac: int = 0, limit: int = 2000):
         items = [x for x in items if x.get("has_ofac_match")]
     items = items[:limit]
 
-    # Armado de filas
-    rows: List[Dict[str, Any]] = []
-    for it in items:
+    # Escribir Excel en memoria.
+    # constant_memory: xlsxwriter va volcando cada fila apenas se completa (exige escribir
+    # en orden de filas, por eso no pasamos por DataFrame.to_excel, que escribe por columnas).
+    # Las celdas siempre son texto literal: ni fórmulas ("=...") ni hipervínculos.
+    bio = BytesIO()
+    wb = xlsxwriter.Workbook(bio, {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    ws = wb.add_worksheet("results")
+    ws.write_row(0, 0, _EXCEL_COLUMNS, wb.add_format({"bold": True}))
+
+    # Armado de filas: cada fila se escribe apenas se arma (mismo orden que _EXCEL_COLUMNS),
+    # sin lista intermedia. _clip_excel nunca devuelve None: sin celdas en blanco.
+    for r, it in enumerate(items, start=1):
         persons = it.get("persons") or []
         matches = it.get("ofac_matches") or []
 
-        rows.append({
-            "processed_utc": _clip_excel(it.get("processed_utc") or it.get("ts_utc")),
-            "source": _clip_excel(it.get("source")),
-            "published": _clip_excel(it.get("published")),
-            "link": _clip_excel(it.get("link")),
-            "has_ofac_match": "SI" if it.get("has_ofac_match") else "NO",
-            "persons": _clip_excel(" | ".join(persons) if persons else "—"),
-            "ofac_matches": _clip_excel(
+        ws.write_row(r, 0, (
+            _clip_excel(it.get("processed_utc") or it.get("ts_utc")),
+            _clip_excel(it.get("source")),
+            _clip_excel(it.get("published")),
+            _clip_excel(it.get("link")),
+            "SI" if it.get("has_ofac_match") else "NO",
+            _clip_excel(" | ".join(persons) if persons else "—"),
+            _clip_excel(
                 " || ".join([
                     f"{m.get('candidate')} -> {m.get('ofac_name')} "
                     f"(score {m.get('score')}{', uid '+str(m.get('uid')) if m.get('uid') else ''})"
                     for m in matches
                 ]) if matches else "—"
             ),
-            "text": _clip_excel(it.get("text")),
-        })
-
-    # DataFrame con validación dura: sin nulos (sin celdas en blanco)
-    df = pd.DataFrame(rows, columns=[
-        "processed_utc",
-        "source",
-        "published",
-        "link",
-        "has_ofac_match",
-        "persons",
-        "ofac_matches",
-        "text",
-    ]).fillna("—")
-
-    # Escribir Excel en memoria
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="results")
+            _clip_excel(it.get("text")),
+        ))
+
+    wb.close()
     bio.seek(0)
 
     stamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -283,7 +333,7 @@ def api_export_excel(only_ofac: int = 0, limit: int = 2000):
         headers=headers,
     )
 
-@app.get("/api/search_ofac")
+@app.get("/api/search_ofac", response_class=ORJSONResponse)
 def api_search_ofac(q: str, limit: int = 20):
     limit = max(1, min(int(limit), 50))
     q = (q or "").strip()
@@ -6,6 +6,7 @@ import os
 MENTIONS_REFRESH_SECONDS = int(os.getenv("MENTIONS_REFRESH_SECONDS", "180"))   # cada 3 min (ticker)
 OFAC_REFRESH_HOURS       = int(os.getenv("OFAC_REFRESH_HOURS", "12"))          # cada 12h (listas)
 API_RESULTS_LIMIT        = int(os.getenv("API_RESULTS_LIMIT", "300"))
+SEEN_IDS_MAX             = int(os.getenv("SEEN_IDS_MAX", "200000"))          # tope del dedupe por id (LRU)
 
 # ==============================
 # OFAC SDN: fuentes oficiales (listas)
@@ -13,10 +14,14 @@ API_RESULTS_LIMIT        = int(os.getenv("API_RESULTS_LIMIT", "300"))
 OFAC_SDN_XML_ZIP_URL = os.getenv("OFAC_SDN_XML_ZIP_URL", "https://www.treasury.gov/ofac/downloads/sdn_xml.zip")
 OFAC_SDN_XML_URL     = os.getenv("OFAC_SDN_XML_URL",     "https://www.treasury.gov/ofac/downloads/sdn.xml")
 
+# Cache en disco de la SDN parseada (clave: ETag del ZIP); vacío = sin cache
+OFAC_CACHE_PATH = os.path.expanduser(os.getenv("OFAC_CACHE_PATH", "~/.cache/ofac/sdn.pkl"))
+
 # ==============================
 # NLP
 # ==============================
 SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))   # docs por batch en nlp.pipe
 
 # ==============================
 # RSS / Atom (rápidos, tipo “stream”)
@@ -41,6 +46,8 @@ NEWS_FEEDS = [
     "https://api.io.canada.ca/io-server/gc/news/en/v2?department=international_development&sort=publishedDate&order=desc&limit=20",
 ]
 
+RSS_FETCH_WORKERS = int(os.getenv("RSS_FETCH_WORKERS", "16"))   # descargas RSS en paralelo
+
 # ==============================
 # Páginas HTML (cuando NO hay RSS confiable)
 # ==============================
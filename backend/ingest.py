@@ -1,16 +1,21 @@
 import re
 import hashlib
 import datetime as dt
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
 
 from .config import (
     ENABLE_TWITTER,
     MAX_TWEETS_PER_SOURCE,
     TWITTER_SOURCES,
     NEWS_FEEDS,
+    RSS_FETCH_WORKERS,
     KEYWORDS,
 )
 
@@ -19,6 +24,17 @@ from .config import (
 # ==================================================
 UA = {"User-Agent": "ofac-social-monitor/1.0"}
 
+# Sesión compartida: keep-alive + pool por host (evita handshake TCP/TLS en cada tick)
+_SESSION = requests.Session()
+_SESSION.headers.update(UA)
+_ADAPTER = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=max(32, RSS_FETCH_WORKERS),
+    max_retries=Retry(total=2, backoff_factor=0.5),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
 def normalize_text(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "")).strip()
 
@@ -29,34 +45,47 @@ def hash_item(*parts: str) -> str:
         h.update(b"|")
     return h.hexdigest()
 
+# Una sola alternancia compilada (un pase en C) en vez de un `kw in txt` por keyword
+_KW_RE = (
+    re.compile("|".join(re.escape(k.lower()) for k in KEYWORDS if k), re.IGNORECASE)
+    if any(KEYWORDS or [])
+    else None
+)
+
 def text_matches_keywords(text: str) -> bool:
-    txt = (text or "").lower()
     # whitelist dura: si no hay KEYWORDS, no devuelve nada (evita “todo pasa”)
-    if not KEYWORDS:
+    if _KW_RE is None:
         return False
-    return any((kw or "").lower() in txt for kw in KEYWORDS if kw)
+    return _KW_RE.search(text or "") is not None
 
 # ==================================================
 # RSS
 # ==================================================
+def _child_text(item, name: str) -> str:
+    # RSS 2.0 sin namespace; RSS 1.0 (RDF) trae los hijos con namespace
+    el = item.find(name)
+    if el is None:
+        el = item.find("{*}" + name)
+    return normalize_text("".join(el.itertext())) if el is not None else ""
+
 def fetch_rss_articles(feed_url: str, timeout: int = 15) -> List[Dict[str, str]]:
     """
     Devuelve items RSS como dict:
     {title, description, link, published}
     """
     try:
-        resp = requests.get(feed_url, timeout=timeout, headers=UA)
+        resp = _SESSION.get(feed_url, timeout=timeout)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.content, "xml")
 
-        items = soup.find_all("item") or []
         out: List[Dict[str, str]] = []
 
-        for it in items:
-            title = normalize_text(getattr(it.title, "text", "") if it.title else "")
-            desc  = normalize_text(getattr(it.description, "text", "") if it.description else "")
-            link  = normalize_text(getattr(it.link, "text", "") if it.link else "")
-            pub   = normalize_text(getattr(it.pubDate, "text", "") if it.pubDate else "")
+        # streaming: cada <item> se procesa y se libera apenas cierra
+        for _, it in etree.iterparse(BytesIO(resp.content), tag="{*}item", recover=True):
+            title = _child_text(it, "title")
+            desc  = _child_text(it, "description")
+            link  = _child_text(it, "link")
+            pub   = _child_text(it, "pubDate")
+            it.clear()
 
             # validación dura: sin texto, no sirve
             if not title and not desc:
@@ -105,8 +134,15 @@ def collect_mentions() -> List[Dict]:
     # --------------------------
     # 1) RSS
     # --------------------------
-    for feed in (NEWS_FEEDS or []):
-        items = fetch_rss_articles(feed)
+    # I/O puro: se bajan todos los feeds en paralelo (map conserva el orden de NEWS_FEEDS)
+    feeds = list(NEWS_FEEDS or [])
+    if feeds:
+        with ThreadPoolExecutor(max_workers=max(1, min(RSS_FETCH_WORKERS, len(feeds)))) as ex:
+            feed_items = list(ex.map(fetch_rss_articles, feeds))
+    else:
+        feed_items = []
+
+    for feed, items in zip(feeds, feed_items):
         for it in items:
             blob = normalize_text(f"{it.get('title', '')} {it.get('description', '')}")
 
@@ -1,5 +1,10 @@
+import os
 import re
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+from pyroaring import FrozenBitMap
 from rapidfuzz import fuzz, process
 
 # =========================
@@ -11,90 +16,136 @@ _ENTITY_STOPWORDS = {
     "BANK","BANCO","TRUST","HOLDINGS","HOLDING","GROUP","GRUPO","FUND","FOUNDATION"
 }
 
+_NON_LETTER_RE = re.compile(r"[^A-ZÑ ]")
+
 def _strip_accents(s: str) -> str:
     # "PETRÓ" -> "PETRO"
+    if s.isascii():
+        # fast path (la gran mayoría de nombres SDN): NFKD no cambia nada
+        return s
     s = unicodedata.normalize("NFKD", s)
     return "".join(ch for ch in s if not unicodedata.combining(ch))
 
-def normalize_name(s: str) -> str:
+def _normalize_name(s: str) -> str:
     s = (s or "").upper()
     s = _strip_accents(s)
-    s = re.sub(r"[^A-ZÑ ]", " ", s)       # solo letras y espacios
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = _NON_LETTER_RE.sub(" ", s)        # solo letras y espacios
+    return " ".join(s.split())            # colapsa espacios + strip
 
-def tokenize_name(norm: str) -> list[str]:
+def _tokenize_name(norm: str) -> tuple[str, ...]:
     # tokens con longitud >=2 para no meter ruido tipo "A"
-    toks = [t for t in (norm or "").split(" ") if len(t) >= 2]
-    return toks
+    # (tupla: inmutable, así puede quedar en cache y compartirse entre llamadas)
+    return tuple(t for t in (norm or "").split(" ") if len(t) >= 2)
 
-def looks_like_entity(tokens: list[str]) -> bool:
+def _looks_like_entity(tokens: tuple[str, ...]) -> bool:
     if not tokens:
         return False
     # si contiene palabras típicas de empresa o termina en SA/LLC etc.
     hit = sum(1 for t in tokens if t in _ENTITY_STOPWORDS)
     return hit >= 1
 
+# Versiones memoizadas para queries: en UI y en batch los mismos nombres se repiten mucho.
+# El build del índice usa las versiones sin cache (cada nombre SDN se ve una sola vez
+# y solo ensuciaría el LRU).
+_NAME_CACHE_SIZE = 1 << 16
+normalize_name = lru_cache(maxsize=_NAME_CACHE_SIZE)(_normalize_name)
+tokenize_name = lru_cache(maxsize=_NAME_CACHE_SIZE)(_tokenize_name)
+looks_like_entity = lru_cache(maxsize=_NAME_CACHE_SIZE)(_looks_like_entity)
+
+_QGRAM = 3
+_QGRAM_MIN = 4   # q-gramas mínimos de la query para usar el índice de q-gramas (norm de 6+ chars)
+
+def _qgrams(norm: str) -> set[str]:
+    return {norm[i:i + _QGRAM] for i in range(len(norm) - _QGRAM + 1)}
+
 # =========================
 # Index OFAC (con bloqueo por tokens)
 # =========================
 def build_ofac_name_index(ofac_entries: list[dict]) -> dict:
     """
-    Estructura:
-      - items: lista de dicts con {norm, tokens, is_entity, entry}
-      - token_to_ids: token -> set(indices) (para prefiltrar)
-      - names: lista de norm (para rapidfuzz, pero ya prefiltrada)
+    Estructura (struct-of-arrays: la fila i de cada columna es la misma entrada):
+      - names: lista de norm (también sirve directo para rapidfuzz)
+      - token_sets: frozenset de tokens por fila (tokens internados: un solo str por token)
+      - n_tokens: np.ndarray[int32] con len(token_sets[i])
+      - is_entity: np.ndarray[bool] (heurística empresa/entidad)
+      - entries: entry OFAC original por fila
+      - token_to_ids: token -> FrozenBitMap de indices (roaring bitmap, para prefiltrar)
+      - qgram_to_ids: 3-grama de norm -> FrozenBitMap de indices (recall ante typos / 1 token)
       - map: norm -> entry (primera ocurrencia)
+      - match_cache: fuzzy_match memoizado sobre este índice (ver _make_match_cache)
     """
-    items = []
-    token_to_ids: dict[str, set[int]] = {}
-    names = []
+    names: list[str] = []
+    token_sets: list[frozenset[str]] = []
+    is_entity: list[bool] = []
+    entries: list[dict] = []
+    token_to_ids: dict[str, list[int]] = {}
+    qgram_to_ids: dict[str, list[int]] = {}
     mp = {}
+    # pool de interning: el mismo token en miles de nombres comparte un único objeto str
+    intern_pool: dict[str, str] = {}
 
     for e in (ofac_entries or []):
         raw = e.get("name", "") or ""
-        norm = normalize_name(raw)
+        norm = _normalize_name(raw)
         if not norm:
             continue
 
-        toks = tokenize_name(norm)
+        toks = _tokenize_name(norm)
         if not toks:
             continue
 
-        is_ent = looks_like_entity(toks)
-
-        idx = len(items)
-        items.append({
-            "norm": norm,
-            "tokens": toks,
-            "token_set": set(toks),
-            "is_entity": is_ent,
-            "entry": e,
-        })
-
+        idx = len(names)
+        tset = frozenset(intern_pool.setdefault(t, t) for t in toks)
         names.append(norm)
+        token_sets.append(tset)
+        is_entity.append(_looks_like_entity(toks))
+        entries.append(e)
         mp.setdefault(norm, e)
 
         # inverted index por token (bloqueo)
-        for t in set(toks):
+        for t in tset:
             if len(t) < 3:
                 continue
-            token_to_ids.setdefault(t, set()).add(idx)
-
-    return {"items": items, "token_to_ids": token_to_ids, "names": names, "map": mp}
+            token_to_ids.setdefault(t, []).append(idx)
+
+        # inverted index por q-grama (bloqueo tolerante a errores de tipeo)
+        for g in _qgrams(norm):
+            qgram_to_ids.setdefault(g, []).append(idx)
+
+    # congelar postings en roaring bitmaps: compactos y con AND/OR multi-way en C
+    postings = {t: FrozenBitMap(ids) for t, ids in token_to_ids.items()}
+    qgram_postings = {g: FrozenBitMap(ids) for g, ids in qgram_to_ids.items()}
+
+    index = {
+        "names": names,
+        "token_sets": token_sets,
+        "n_tokens": np.fromiter((len(ts) for ts in token_sets), dtype=np.int32, count=len(token_sets)),
+        "is_entity": np.asarray(is_entity, dtype=bool),
+        "entries": entries,
+        "token_to_ids": postings,
+        "qgram_to_ids": qgram_postings,
+        "map": mp,
+    }
+    index["match_cache"] = _make_match_cache(index)
+    return index
 
 # =========================
 # Matching mejorado (únicos / relevantes)
 # =========================
-def _candidate_ids_for_query(q_tokens: list[str], ofac_index: dict, max_pool: int = 5000) -> list[int]:
+_NO_IDS = np.empty(0, dtype=np.int32)
+
+def _candidate_ids_for_query(q_set: frozenset[str], ofac_index: dict, max_pool: int = 5000) -> np.ndarray:
     """
     Pre-filtro por tokens:
-      - usa intersección/union de postings para reducir el universo
-      - si no hay postings, retorna [] (sin candidatos)
+      - intersección progresiva de postings (menor primero) para reducir el universo
+      - si la intersección se muere, suma las filas que pueden compartir 2+ tokens de la
+        query (pares de postings; o postings simples si la query trae tokens cortos)
+      - si no hay postings (o el pool supera max_pool), retorna array vacío (sin candidatos)
+    Devuelve np.ndarray[int32] ordenado ascendente (indices de fila del índice).
     """
     token_to_ids = ofac_index.get("token_to_ids", {}) or {}
     postings = []
-    for t in set(q_tokens):
+    for t in q_set:
         if len(t) < 3:
             continue
         ids = token_to_ids.get(t)
@@ -102,34 +153,249 @@ def _candidate_ids_for_query(q_tokens: list[str], ofac_index: dict, max_pool: in
             postings.append(ids)
 
     if not postings:
-        return []
+        return _NO_IDS
 
-    # estrategia: arrancar con el token más "raro" (menor posting)
+    # tokens de 2 letras (SA, CO, AL...) no están indexados, pero cuentan para el overlap
+    has_short = any(len(t) < 3 for t in q_set)
+
+    # estrategia: intersecar de menor a mayor posting (el token más "raro" primero)
     postings.sort(key=len)
-    pool = set(postings[0])
-
-    # si la query tiene 2+ tokens, intenta intersecar para aumentar precisión
-    for ids in postings[1:]:
-        # intersección suave: si se muere la intersección, deja union (para no perder recall)
-        inter = pool.intersection(ids)
-        if inter:
-            pool = inter
+    pool = postings[0]
+    for i, ids in enumerate(postings[1:], start=1):
+        inter = pool & ids
+        if not inter:
+            # la intersección se murió: lo acumulado solo cubre filas con los tokens más
+            # raros, y se perderían las que comparten otros 2 tokens de la query
+            # (p.ej. "LOPEZ AHMED" para "LOPEZ AHMED IVAN"). Se suman todas las filas con
+            # 2+ tokens en común: union de las intersecciones por pares de postings.
+            # Con tokens cortos en la query, 1 token indexado + 1 corto ya son 2: ahí se
+            # suman los postings simples (p.ej. "MOROS SA SA" para "TORRES SA BANK MOROS").
+            if has_short:
+                extra = postings
+            else:
+                extra = [a & b for j, a in enumerate(postings) for b in postings[j + 1:]]
+            # si los 2 más raros no co-ocurren, además su union (como antes)
+            wide = FrozenBitMap.union(pool | ids if i == 1 else pool, *extra)
+            # si la union se dispara (tokens genéricos), quedarse con lo acumulado (ya 2+ tokens)
+            if i == 1 or len(wide) <= max_pool:
+                pool = wide
+            break
+        pool = inter
+
+    # pool demasiado grande = solo tokens genéricos: demasiado ambiguo para OFAC
+    if len(pool) > max_pool:
+        return _NO_IDS
+
+    # roaring ya itera en orden: array int32 ordenado por indice, sin pasar por lista
+    return np.asarray(pool.to_array(), dtype=np.int32)
+
+def _qgram_candidate_ids(q: str, ofac_index: dict, max_pool: int = 5000) -> np.ndarray:
+    """
+    Pre-filtro por 3-gramas (para queries de 1 token o con tokens mal escritos):
+      - candidatos = filas que comparten al menos |G(q)| - 3 q-gramas con la query
+        (un error de tipeo "rompe" hasta 3 q-gramas)
+      - si el pool supera max_pool, se queda con los de mayor overlap
+    """
+    qgram_to_ids = ofac_index.get("qgram_to_ids", {}) or {}
+    grams = _qgrams(q)
+    if len(grams) < _QGRAM_MIN:
+        return _NO_IDS
+
+    postings = [qgram_to_ids[g].to_array() for g in grams if g in qgram_to_ids]
+    if not postings:
+        return _NO_IDS
+
+    ids, counts = np.unique(np.concatenate(postings), return_counts=True)
+    ok = counts >= max(1, len(grams) - _QGRAM)
+    ids, counts = ids[ok], counts[ok]
+
+    if len(ids) > max_pool:
+        # los de mayor overlap, devueltos en orden de indice
+        ids = np.sort(ids[np.argsort(-counts, kind="stable")[:max_pool]])
+
+    return np.asarray(ids, dtype=np.int32)
+
+# camino por q-gramas: un token de la query "está" en el candidato si hay un token del
+# candidato con fuzz.ratio >= _TOKEN_FUZZY_MIN (MADUROS ~ MADURO); tokens cortos, exacto
+_TOKEN_FUZZY_MIN = 80.0
+_TOKEN_FUZZY_MINLEN = 4
+
+def _soft_token_matches(q_set: frozenset[str], c_sets: list[frozenset[str]]) -> list[frozenset[str]]:
+    """
+    Por token de query, el set de tokens del vocabulario de los candidatos que cuentan
+    como "el mismo" (incluye el propio token). Una sola cdist query-tokens x vocabulario.
+    """
+    long_q = [t for t in q_set if len(t) >= _TOKEN_FUZZY_MINLEN]
+    vocab = list(frozenset().union(*c_sets)) if long_q else []
+    close = {t: {t} for t in q_set}
+    if long_q and vocab:
+        m = process.cdist(long_q, vocab, scorer=fuzz.ratio, score_cutoff=_TOKEN_FUZZY_MIN)
+        for t, row in zip(long_q, m):
+            close[t].update(vocab[j] for j in np.flatnonzero(row).tolist())
+    return [frozenset(v) for v in close.values()]
+
+# pesos del score compuesto (ver _score_candidates)
+_W_WRATIO = 0.55
+_W_TSET = 0.30
+_W_JACC = 0.15
+_SUBSET_BONUS = 3.0
+_ENTITY_PENALTY = 8.0
+
+def _scorer_cutoffs(min_score: float) -> tuple[float, float]:
+    """
+    score_cutoff seguro por scorer: el resto de términos al máximo (100 y bonus),
+    el score compuesto no alcanza min_score si el scorer queda bajo su cutoff.
+    """
+    rest = _W_JACC * 100.0 + _SUBSET_BONUS
+    c1 = (min_score - _W_TSET * 100.0 - rest) / _W_WRATIO
+    c2 = (min_score - _W_WRATIO * 100.0 - rest) / _W_TSET
+    return max(0.0, c1), max(0.0, c2)
+
+# scoring en paralelo para pools grandes: los scorers de rapidfuzz sueltan el GIL,
+# así que trozos del pool en hilos escalan con los cores. cdist(workers=-1) no sirve
+# acá porque reparte por filas de queries y siempre hay una sola query.
+_PARALLEL_CHUNK = 1000          # candidatos mínimos por trozo (debajo, no compensa el hilo)
+_SCORE_WORKERS = os.cpu_count() or 1
+# el executor levanta hilos recién cuando hay trabajo: con pools chicos nunca se usa
+_SCORE_POOL = ThreadPoolExecutor(max_workers=_SCORE_WORKERS, thread_name_prefix="fuzzy-score")
+
+def _cdist_one(q: str, choices: list[str], scorer, score_cutoff: float) -> np.ndarray:
+    """
+    Scores de q contra choices (float64, mismo orden). Si el pool da para 2+ trozos
+    de _PARALLEL_CHUNK, los reparte en el thread pool (resultado idéntico al secuencial).
+    """
+    n_chunks = min(_SCORE_WORKERS, len(choices) // _PARALLEL_CHUNK)
+    if n_chunks <= 1:
+        return process.cdist([q], choices, scorer=scorer, dtype=np.float64, score_cutoff=score_cutoff)[0]
+
+    bounds = np.linspace(0, len(choices), n_chunks + 1).astype(int).tolist()
+    parts = _SCORE_POOL.map(
+        lambda ab: process.cdist([q], choices[ab[0]:ab[1]], scorer=scorer, dtype=np.float64, score_cutoff=score_cutoff)[0],
+        zip(bounds[:-1], bounds[1:]),
+    )
+    return np.concatenate(list(parts))
+
+def _score_candidates(q: str, q_set: frozenset[str], q_is_entity: bool, cand_ids: np.ndarray, ofac_index: dict, min_overlap: int = 2, min_score: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scoring compuesto sobre los candidatos prefiltrados.
+    Devuelve (ids ndarray, scores ndarray) de los candidatos que pasan las reglas duras
+    de tokens, en el mismo orden que cand_ids.
+    Con min_score > 0 los scorers cortan antes (score_cutoff): los scores por debajo de
+    min_score no son exactos, pero siguen quedando por debajo de min_score.
+    Con min_overlap=0 (candidatos por q-gramas) el overlap de tokens tolera errores de
+    tipeo (ver _soft_token_matches); si no, es exacto.
+    """
+    names = ofac_index["names"]
+    token_sets = ofac_index["token_sets"]
+    n_tokens = ofac_index["n_tokens"]
+    is_entity = ofac_index["is_entity"]
+
+    # 1) reglas duras por intersección de tokens (exactas, en Python;
+    #    se itera sobre ints nativos: indexar listas con np.int32 es más lento)
+    #    una sola operación de sets por candidato: union y subset salen del overlap
+    qn = len(q_set)
+    cids = cand_ids.tolist()
+    soft = _soft_token_matches(q_set, [token_sets[cid] for cid in cids]) if min_overlap == 0 else None
+    keep: list[int] = []
+    overlaps: list[int] = []
+    for cid in cids:
+        c_set = token_sets[cid]
+        if soft is None:
+            overlap = len(q_set.intersection(c_set))
         else:
-            pool = pool.union(ids)
+            # tope en |c|: dos tokens de query parecidos al mismo token no cuentan doble
+            overlap = min(len(c_set), sum(1 for close in soft if not close.isdisjoint(c_set)))
 
-        if len(pool) > max_pool:
-            break
+        # regla dura: mínimo 2 tokens en común (salvo candidatos por q-gramas);
+        # con query de 2 tokens eso ya exige ambos (evita "PETRO ..." sin "GUSTAVO")
+        if overlap < min_overlap:
+            continue
+
+        keep.append(cid)
+        overlaps.append(overlap)
+
+    if not keep:
+        return _NO_IDS, np.empty(0)
 
-    # devuelve lista estable
-    return list(pool)
+    # 2) base scorers en batch: una sola llamada a C por scorer sobre todos los sobrevivientes
+    c_norms = [names[cid] for cid in keep]
+    keep = np.asarray(keep, dtype=np.int32)
+    # score_cutoff: rapidfuzz devuelve 0 sin terminar el cálculo caro si no llega al cutoff
+    cut1, cut2 = _scorer_cutoffs(min_score)
+    s1 = _cdist_one(q, c_norms, fuzz.WRatio, cut1)
+    s2 = _cdist_one(q, c_norms, fuzz.token_set_ratio, cut2)
+
+    # 3) mezcla + penalización/bonus, vectorizado sobre todos los candidatos
+    # jaccard en tokens (0-100), sin armar la union: |A ∪ B| = |A| + |B| - |A ∩ B|
+    ov = np.asarray(overlaps)
+    jacc = 100.0 * (ov / np.maximum(1, qn + n_tokens[keep] - ov))
+    scores = _W_WRATIO * s1 + _W_TSET * s2 + _W_JACC * jacc
+
+    # penalización: si query parece persona y candidato es entidad
+    if not q_is_entity:
+        scores = np.where(is_entity[keep], scores - _ENTITY_PENALTY, scores)
+
+    # pequeño bonus si todos los tokens de query están incluidos en el candidato
+    # (q ⊆ c  <=>  |q ∩ c| == |q|; en el camino por q-gramas, con tolerancia a typos)
+    scores = np.where(ov == qn, scores + _SUBSET_BONUS, scores)
+
+    return keep, scores
+
+# entradas por índice del cache de fuzzy_match (query normalizada, min_score)
+_MATCH_CACHE_SIZE = 1 << 16
+
+def _match_candidates(q: str, q_tokens: tuple[str, ...], q_set: frozenset[str], q_is_entity: bool, ofac_index: dict, min_score: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bloqueo + scoring. Devuelve (ids, scores) como _score_candidates:
+      - query de 2+ tokens: bloqueo por tokens, exigiendo 2+ tokens en común
+      - si ningún candidato queda con 2+ tokens en común y la query trae un token
+        indexable (3+ letras) sin postings (pinta de typo: "MADUROS"), o la query es de
+        1 token: bloqueo por q-gramas; ahí no se exige token exacto en común
+        (min_overlap=0) y decide el scoring
+      - si todos los tokens existen en el índice y no hay candidatos, es un nombre que
+        no está en la lista (el caso normal en menciones): no se paga el camino q-gramas
+    """
+    if len(q_tokens) >= 2:
+        cand_ids = _candidate_ids_for_query(q_set, ofac_index)
+        if cand_ids.size:
+            ids, scores = _score_candidates(q, q_set, q_is_entity, cand_ids, ofac_index, 2, min_score)
+            if ids.size:
+                return ids, scores
+
+        token_to_ids = ofac_index.get("token_to_ids", {}) or {}
+        if not any(len(t) >= 3 and t not in token_to_ids for t in q_set):
+            return _NO_IDS, np.empty(0)
+
+    cand_ids = _qgram_candidate_ids(q, ofac_index)
+    if not cand_ids.size:
+        return _NO_IDS, np.empty(0)
+    return _score_candidates(q, q_set, q_is_entity, cand_ids, ofac_index, 0, min_score)
+
+def _make_match_cache(ofac_index: dict):
+    """
+    lru_cache de _fuzzy_match_norm atado a un índice. Vive dentro del propio índice:
+    al refrescar OFAC se arma un índice nuevo y el cache viejo se va con el anterior
+    (no hace falta cache_clear ni versionar).
+    """
+    @lru_cache(maxsize=_MATCH_CACHE_SIZE)
+    def cached(q: str, min_score: float):
+        return _fuzzy_match_norm(q, ofac_index, min_score)
+    return cached
 
 def fuzzy_match(name: str, ofac_index: dict, min_score: int = 92):
     """
     Devuelve (best_name, score, entry) o None
-    Reglas duras anti-“falsos positivos”:
-      - si query tiene >=2 tokens: exige mínimo 2 tokens en común
-      - si query tiene exactamente 2 tokens: (por defecto) exige que ambos tokens aparezcan
+    Reglas duras anti-“falsos positivos” (ver _match_candidates):
+      - query de 1 token: None (un apellido suelto es demasiado ambiguo para alertar;
+        la búsqueda de UI, fuzzy_top_matches, sí los acepta)
+      - query de 2+ tokens: bloqueo por tokens con mínimo 2 tokens exactos en común
+        (con query de 2 tokens, ambos)
+      - si ningún candidato cumple eso y algún token no está en el índice (typo):
+        bloqueo por q-gramas sin exigir tokens exactos (overlap tolerante a typos);
+        decide el umbral de score
       - penaliza entidades cuando query parece persona
+    Memoizado por índice sobre la query normalizada: en batch los mismos nombres se repiten.
+    El entry devuelto es el del índice (compartido): no modificarlo.
     """
     q = normalize_name(name)
     if not q:
@@ -140,6 +406,14 @@ def fuzzy_match(name: str, ofac_index: dict, min_score: int = 92):
     if q in mp:
         return (q, 100, mp[q])
 
+    cached = ofac_index.get("match_cache")
+    if cached is None:
+        # índice armado a mano (p.ej. el vacío inicial de app.STATE)
+        return _fuzzy_match_norm(q, ofac_index, min_score)
+    return cached(q, min_score)
+
+def _fuzzy_match_norm(q: str, ofac_index: dict, min_score: float):
+    """fuzzy_match para una query ya normalizada y sin match exacto."""
     q_tokens = tokenize_name(q)
     if len(q_tokens) < 2:
         # si solo hay 1 token, es demasiado ambiguo para OFAC
@@ -147,101 +421,42 @@ def fuzzy_match(name: str, ofac_index: dict, min_score: int = 92):
 
     q_is_entity = looks_like_entity(q_tokens)
 
-    cand_ids = _candidate_ids_for_query(q_tokens, ofac_index)
-    if not cand_ids:
-        return None
-
-    items = ofac_index.get("items", []) or []
-
-    # scoring compuesto + reglas duras por intersección
-    best = None  # (score, norm, entry)
-    q_set = set(q_tokens)
-
-    for cid in cand_ids:
-        it = items[cid]
-        c_norm = it["norm"]
-        c_set = it["token_set"]
-
-        overlap = len(q_set.intersection(c_set))
-
-        # regla dura: mínimo 2 tokens en común
-        if overlap < 2:
-            continue
-
-        # regla extra: si query son 2 tokens, exigir ambos (evita "PETRO ..." sin "GUSTAVO")
-        if len(q_set) == 2 and overlap < 2:
-            continue
-
-        # base scorers
-        s1 = fuzz.WRatio(q, c_norm)
-        s2 = fuzz.token_set_ratio(q, c_norm)
-
-        # jaccard en tokens (0-100)
-        j = 100.0 * (overlap / max(1, len(q_set.union(c_set))))
-
-        score = 0.55 * s1 + 0.30 * s2 + 0.15 * j
-
-        # penalización: si query parece persona y candidato es entidad
-        if (not q_is_entity) and it["is_entity"]:
-            score -= 8.0
-
-        # pequeño bonus si todos los tokens de query están incluidos en el candidato
-        if q_set.issubset(c_set):
-            score += 3.0
-
-        if best is None or score > best[0]:
-            best = (score, c_norm, it["entry"])
+    # tokens mal escritos entran por q-gramas: ahí decide solo el umbral de score
+    q_set = frozenset(q_tokens)   # un solo set por query, compartido por bloqueo y scoring
 
-    if not best:
+    # bloqueo + scoring compuesto + reglas duras por intersección
+    ids, scores = _match_candidates(q, q_tokens, q_set, q_is_entity, ofac_index, min_score)
+    if not ids.size:
         return None
 
-    score, best_name, entry = best
+    # mejor score (argmax: ante empate gana el primero)
+    k = int(np.argmax(scores))
+    score = scores[k]
     if score >= float(min_score):
-        return (best_name, round(float(score), 1), entry)
+        cid = int(ids[k])
+        return (ofac_index["names"][cid], round(float(score), 1), ofac_index["entries"][cid])
 
     return None
 
 def fuzzy_top_matches(name: str, ofac_index: dict, top_k: int = 10, min_score: int = 80) -> list[tuple[str, float, dict]]:
     """
-    Para UI: lista top_k (name_norm, score, entry) con el mismo filtro duro de tokens.
+    Para UI: lista top_k (name_norm, score, entry) con la misma recuperación que fuzzy_match,
+    pero acepta queries de 1 token (por q-gramas): acá el usuario revisa la lista a mano.
     """
     q = normalize_name(name)
     q_tokens = tokenize_name(q)
-    if not q or len(q_tokens) < 2:
+    if not q or not q_tokens:
         return []
 
     q_is_entity = looks_like_entity(q_tokens)
-    q_set = set(q_tokens)
 
-    cand_ids = _candidate_ids_for_query(q_tokens, ofac_index)
-    if not cand_ids:
-        return []
-
-    items = ofac_index.get("items", []) or []
-    scored = []
-
-    for cid in cand_ids:
-        it = items[cid]
-        c_norm = it["norm"]
-        c_set = it["token_set"]
-        overlap = len(q_set.intersection(c_set))
-        if overlap < 2:
-            continue
-        if len(q_set) == 2 and overlap < 2:
-            continue
-
-        s1 = fuzz.WRatio(q, c_norm)
-        s2 = fuzz.token_set_ratio(q, c_norm)
-        j = 100.0 * (overlap / max(1, len(q_set.union(c_set))))
+    q_set = frozenset(q_tokens)   # un solo set por query, compartido por bloqueo y scoring
+    ids, scores = _match_candidates(q, q_tokens, q_set, q_is_entity, ofac_index, min_score)
 
-        score = 0.55 * s1 + 0.30 * s2 + 0.15 * j
-        if (not q_is_entity) and it["is_entity"]:
-            score -= 8.0
-        if q_set.issubset(c_set):
-            score += 3.0
-
-        if score >= min_score:
-            scored.append((c_norm, round(float(score), 1), it["entry"]))
+    names = ofac_index["names"]
+    entries = ofac_index["entries"]
+    hits = np.flatnonzero(scores >= min_score)
+    scored = [(names[cid], round(sc, 1), entries[cid]) for cid, sc in zip(ids[hits].tolist(), scores[hits].tolist())]
 
     scored.sort(key=lambda x: (-x[1], x[0]))
 
@@ -256,8 +471,10 @@ def core_person_key(norm_name: str) -> str:
     Key “core” para deduplicar resultados similares en UI.
     Heurística:
       - usa los 2 primeros tokens (OFAC suele venir como "APELLIDO NOMBRE ...")
+    Recibe un nombre ya normalizado (el `norm` que devuelve fuzzy_top_matches):
+    no se vuelve a normalizar.
     """
-    toks = tokenize_name(normalize_name(norm_name))
+    toks = tokenize_name(norm_name)
     if len(toks) < 2:
         return norm_name
     return f"{toks[0]}|{toks[1]}"
@@ -267,14 +484,10 @@ def dedupe_by_core(matches: list[tuple[str, float, dict]], top_k: int = 10) -> l
     Dedup visual: si salen muchas variantes del mismo “core”, deja solo la mejor (primera).
     Asume que matches ya viene ordenado desc por score.
     """
-    seen = set()
-    out: list[tuple[str, float, dict]] = []
-    for nm, sc, e in matches:
-        key = core_person_key(nm)
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append((nm, sc, e))
-        if len(out) >= max(1, int(top_k)):
+    top_k = max(1, int(top_k))
+    by_core: dict[str, tuple[str, float, dict]] = {}
+    for m in matches:
+        by_core.setdefault(core_person_key(m[0]), m)
+        if len(by_core) >= top_k:
             break
-    return out
+    return list(by_core.values())
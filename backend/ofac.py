@@ -1,72 +1,126 @@
 import io
+import os
+import pickle
+import shutil
+import logging
 import zipfile
+import tempfile
 import requests
 import datetime as dt
-from xml.etree import ElementTree as ET
+from typing import Optional
+from lxml import etree
 
-from .config import OFAC_SDN_XML_ZIP_URL, OFAC_SDN_XML_URL
+from .config import OFAC_SDN_XML_ZIP_URL, OFAC_SDN_XML_URL, OFAC_CACHE_PATH
 
-def _strip_ns(tag: str) -> str:
-    # Maneja namespaces variables (OFAC cambió namespaces con SLS)
-    return tag.split("}")[-1] if "}" in tag else tag
+log = logging.getLogger("ofac-monitor")
 
 def _safe_text(elem):
     return (elem.text or "").strip()
 
-def download_sdn_xml_bytes(timeout=60) -> bytes:
+# Descargas hasta este tamaño quedan en RAM; por encima el buffer se vuelca a disco
+_SPOOL_MAX_BYTES = 16 << 20
+
+def _download_to_spool(url: str, timeout: int, headers: Optional[dict] = None):
+    """
+    Baja `url` en streaming (chunks) a un SpooledTemporaryFile, sin materializar
+    el body completo como bytes. Devuelve (buffer rebobinado, ETag);
+    buffer es None si el servidor respondió 304 Not Modified.
+    """
+    with requests.get(url, stream=True, timeout=timeout, headers=headers) as r:
+        if r.status_code == 304:
+            return None, r.headers.get("ETag")
+        r.raise_for_status()
+        r.raw.decode_content = True  # respeta Content-Encoding (gzip) del servidor
+        buf = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+        shutil.copyfileobj(r.raw, buf, 1 << 20)
+        etag = r.headers.get("ETag")
+    buf.seek(0)
+    return buf, etag
+
+def download_sdn_xml_bytes(timeout=60, etag: Optional[str] = None) -> tuple[Optional[bytes], Optional[str]]:
     """
     Intenta descargar SDN XML comprimido (sdn_xml.zip); si falla, usa sdn.xml directo.
+    Retorna (xml_bytes, etag_del_zip).
+    Con `etag` hace GET condicional del ZIP: si no cambió (304) retorna (None, etag).
     """
     # 1) ZIP
     try:
-        r = requests.get(OFAC_SDN_XML_ZIP_URL, timeout=timeout)
-        r.raise_for_status()
-        z = zipfile.ZipFile(io.BytesIO(r.content))
-        # el zip típicamente contiene sdn.xml
-        xml_names = [n for n in z.namelist() if n.lower().endswith(".xml")]
-        if not xml_names:
-            raise RuntimeError("ZIP no contiene XML")
-        return z.read(xml_names[0])
+        headers = {"If-None-Match": etag} if etag else None
+        buf, new_etag = _download_to_spool(OFAC_SDN_XML_ZIP_URL, timeout, headers)
+        if buf is None:
+            return None, new_etag or etag
+        with buf, zipfile.ZipFile(buf) as z:
+            # el zip típicamente contiene sdn.xml
+            xml_names = [n for n in z.namelist() if n.lower().endswith(".xml")]
+            if not xml_names:
+                raise RuntimeError("ZIP no contiene XML")
+            return z.read(xml_names[0]), new_etag
     except Exception:
-        # 2) Directo
-        r = requests.get(OFAC_SDN_XML_URL, timeout=timeout)
-        r.raise_for_status()
-        return r.content
+        # 2) Directo (sin ETag: el cache queda atado solo al ZIP)
+        buf, _ = _download_to_spool(OFAC_SDN_XML_URL, timeout)
+        with buf:
+            return buf.read(), None
+
+# localname de los hijos de <sdnEntry> -> campo que se extrae
+_SDN_FIELDS = {
+    "uid": "uid",
+    "lastName": "last", "last": "last",
+    "firstName": "first", "first": "first",
+    "sdnName": "whole", "name": "whole",
+    "sdnType": "type", "type": "type",
+    "remarks": "remarks",
+}
+
+def _sdn_field(tag) -> Optional[str]:
+    if not isinstance(tag, str):
+        # comentarios / processing instructions
+        return None
+    return _SDN_FIELDS.get(etree.QName(tag).localname)
 
 def parse_sdn_xml(xml_bytes: bytes) -> list[dict]:
     """
     Parse minimal del SDN.XML: devuelve lista de entradas con campos claves:
     uid, name, type (si está), remarks (si está)
-    """
-    root = ET.fromstring(xml_bytes)
 
+    Streaming con lxml.iterparse: cada <sdnEntry> se procesa al cerrarse y se libera,
+    así nunca está el árbol completo en memoria. "{*}" acepta cualquier namespace
+    (OFAC cambió namespaces con SLS).
+    """
     entries = []
-    for child in root.iter():
-        if _strip_ns(child.tag) != "sdnEntry":
-            continue
-
+    # tag completo ("{ns}lastName") -> campo: el namespace se resuelve una vez por tag
+    # distinto y no por elemento
+    field_of: dict = {}
+    n_sdn = 0
+    context = etree.iterparse(io.BytesIO(xml_bytes), events=("end",), tag="{*}sdnEntry")
+    for _, child in context:
+        n_sdn += 1
         data = {"uid": None, "name": None, "type": None, "remarks": None}
 
         # uid suele ser atributo o campo <uid>
         if "uid" in child.attrib:
             data["uid"] = child.attrib.get("uid")
 
-        first = last = whole = typ = remarks = None
-
-        for e in list(child):
-            t = _strip_ns(e.tag)
-            if t == "uid":
-                data["uid"] = _safe_text(e)
-            elif t in ("lastName", "last"):
-                last = _safe_text(e)
-            elif t in ("firstName", "first"):
-                first = _safe_text(e)
-            elif t in ("sdnName", "name"):
-                whole = _safe_text(e)
-            elif t in ("sdnType", "type"):
-                typ = _safe_text(e)
-            elif t in ("remarks",):
-                remarks = _safe_text(e)
+        fields = {}
+        for e in child:
+            tag = e.tag
+            key = field_of.get(tag, "")
+            if key == "":
+                key = field_of[tag] = _sdn_field(tag)
+            if key:
+                fields[key] = _safe_text(e)
+
+        if "uid" in fields:
+            data["uid"] = fields["uid"]
+        first = fields.get("first")
+        last = fields.get("last")
+        whole = fields.get("whole")
+        typ = fields.get("type")
+        remarks = fields.get("remarks")
+
+        # liberar la entrada ya leída (y las hermanas anteriores) para mantener memoria plana
+        child.clear()
+        while child.getprevious() is not None:
+            del child.getparent()[0]
 
         # Construir name
         if whole:
@@ -82,29 +136,59 @@ def parse_sdn_xml(xml_bytes: bytes) -> list[dict]:
         if data["name"]:
             entries.append(data)
 
-    # fallback si el iter anterior no encontró: algunos SDN XML vienen con estructura distinta
-    if not entries:
-        for sdnEntry in root.findall(".//"):
-            if _strip_ns(sdnEntry.tag) != "sdnEntry":
-                continue
-            name = None
-            uid = sdnEntry.attrib.get("uid")
-            # intenta sdnName en cualquier profundidad
-            for e in sdnEntry.iter():
-                if _strip_ns(e.tag) in ("sdnName", "name"):
-                    name = _safe_text(e)
-                    break
-            if name:
-                entries.append({"uid": uid, "name": name, "type": None, "remarks": None})
+    if not n_sdn:
+        # sin segundo recorrido "por si acaso": "{*}" ya cubre cualquier namespace, así que
+        # esto es un archivo que no es SDN (o cambió el formato). Fallar (refresh_ofac lo loguea
+        # y conserva el índice anterior) en vez de dejar la lista vacía.
+        root = context.root
+        root_tag = root.tag if root is not None else None
+        raise RuntimeError(f"SDN XML sin entradas <sdnEntry> (root={root_tag!r})")
 
     return entries
 
+def _load_cache() -> Optional[dict]:
+    if not OFAC_CACHE_PATH:
+        return None
+    try:
+        with open(OFAC_CACHE_PATH, "rb") as f:
+            cache = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        log.warning("Cache OFAC ilegible, se ignora: %s", OFAC_CACHE_PATH, exc_info=True)
+        return None
+    # cache de otra fuente (URL cambiada por env) no sirve
+    if not isinstance(cache, dict) or cache.get("source_zip") != OFAC_SDN_XML_ZIP_URL:
+        return None
+    return cache
+
+def _save_cache(cache: dict) -> None:
+    if not OFAC_CACHE_PATH:
+        return
+    try:
+        os.makedirs(os.path.dirname(OFAC_CACHE_PATH) or ".", exist_ok=True)
+        tmp = OFAC_CACHE_PATH + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, OFAC_CACHE_PATH)  # atómico: nunca queda un cache a medio escribir
+    except Exception:
+        log.warning("No se pudo escribir cache OFAC: %s", OFAC_CACHE_PATH, exc_info=True)
+
 def fetch_and_parse_sdn() -> tuple[list[dict], dict]:
     """
     Retorna (entries, meta) con timestamps.
+    Si hay cache en disco con ETag y el ZIP no cambió (304), reusa las entradas
+    ya parseadas (sin bajar ni parsear de nuevo).
     """
     started = dt.datetime.utcnow()
-    xml_bytes = download_sdn_xml_bytes()
+    cache = _load_cache()
+    xml_bytes, etag = download_sdn_xml_bytes(etag=(cache or {}).get("etag"))
+
+    if xml_bytes is None and cache is not None:
+        entries = cache["entries"]
+        meta = {**cache["meta"], "fetched_at_utc": started.isoformat() + "Z", "not_modified": True}
+        return entries, meta
+
     entries = parse_sdn_xml(xml_bytes)
     meta = {
         "fetched_at_utc": started.isoformat() + "Z",
@@ -112,4 +196,6 @@ def fetch_and_parse_sdn() -> tuple[list[dict], dict]:
         "source_zip": OFAC_SDN_XML_ZIP_URL,
         "source_xml": OFAC_SDN_XML_URL,
     }
+    if etag:
+        _save_cache({"source_zip": OFAC_SDN_XML_ZIP_URL, "etag": etag, "entries": entries, "meta": meta})
     return entries, meta